@@ -9,27 +9,27 @@ the bug data from Bugzilla.
 
 import asyncio
 import argparse
-import json
-
-from .bugzilla import fetch_bug_data, needInfo, close_bug
-from .auto import auto_deploy_exceptions
-from .remoteSettings import (
-    list_exceptions,
-    add_exceptions,
-    remove_exceptions,
-    print_exception,
-)
+import sys
+
+from . import jsonUtils
 
 from .constants import (
     DEV_SERVER_LOCATION,
-    STAGE_SERVER_LOCATION,
-    PROD_SERVER_LOCATION,
+    SERVER_LOCATIONS,
 )
 
 def lowercase_arg(value):
     """Convert argument to lowercase for case-insensitive comparison."""
     return value.lower()
 
+# Options of the --server argument, shared by the RemoteSettings commands.
+# The choices stay an ordered tuple so the usage message lists them in order.
+_SERVER_ARGUMENT = dict(
+    choices=tuple(SERVER_LOCATIONS),
+    required=True,
+    type=lowercase_arg,
+    help="The RemoteSettings server location (dev, stage, or prod)")
+
 def get_server_location_from_args(args):
     """
     Determine the server location based on command line arguments.
@@ -38,33 +38,29 @@ def get_server_location_from_args(args):
         args: Command line arguments containing the server selection
 
     Returns:
-        The URL of the selected server (dev, stage, or prod)
+        The --server-location URL if given, otherwise the URL of the selected
+        server (dev, stage, or prod)
     """
-    if args.server == "stage":
-        server_location = STAGE_SERVER_LOCATION
-    elif args.server == "prod":
-        server_location = PROD_SERVER_LOCATION
-    else:
-        server_location = DEV_SERVER_LOCATION
-    return server_location
+    if args.server_location:
+        return args.server_location
+    return SERVER_LOCATIONS.get(args.server, DEV_SERVER_LOCATION)
 
-async def execute():
+def read_bug_ids(path):
     """
-    Main execution function that parses command line arguments and executes the appropriate command.
+    Read bug IDs from a file, one per line.
+
+    Args:
+        path: Path to the file containing the bug IDs
+
+    Returns:
+        The list of bug IDs, without blank lines and surrounding whitespace
     """
-    parser = argparse.ArgumentParser(description="Tool to manage UrlClassifier exceptions on the RemoteSetting server")
-    
-    # Create subparsers first
-    subparsers = parser.add_subparsers(dest='command', help='Available commands')
+    with open(path, 'r') as f:
+        return [line.strip() for line in f if line.strip()]
 
-    # List command
-    list_parser = subparsers.add_parser('list', help='List all exceptions')
-    list_parser.add_argument(
-        "--server",
-        choices=["dev", "stage", "prod"],
-        required=True,
-        type=lowercase_arg,
-        help="The RemoteSettings server location (dev, stage, or prod)")
+def _build_list(list_parser):
+    """Add the arguments of the `list` command."""
+    list_parser.add_argument("--server", **_SERVER_ARGUMENT)
     list_parser.add_argument(
         "--server-location",
         help="The server location to list the exceptions from. If not provided, the default server location will be used."
@@ -78,15 +74,10 @@ async def execute():
         action="store_true",
         help="Output in JSON format only (no decorative text)")
 
-    # Add command
-    add_parser = subparsers.add_parser('add', help='Add exceptions from a JSON file')
+def _build_add(add_parser):
+    """Add the arguments of the `add` command."""
     add_parser.add_argument('json_file', help='Path to JSON file containing exception(s)')
-    add_parser.add_argument(
-        "--server",
-        choices=["dev", "stage", "prod"],
-        required=True,
-        type=lowercase_arg,
-        help="The RemoteSettings server location (dev, stage, or prod)")
+    add_parser.add_argument("--server", **_SERVER_ARGUMENT)
     add_parser.add_argument(
         "--server-location",
         help="The server location to add the exceptions to. If not provided, the default server location will be used."
@@ -100,8 +91,8 @@ async def execute():
         action="store_true",
         help="Skip confirmation prompts")
 
-    # Remove command
-    remove_parser = subparsers.add_parser('remove', help='Remove specific exceptions')
+def _build_remove(remove_parser):
+    """Add the arguments of the `remove` command."""
     remove_parser.add_argument(
         'exception_ids', 
         nargs='*',  # Changed from '+' to '*' to make it optional
@@ -110,12 +101,7 @@ async def execute():
         "--all",
         action="store_true",
         help="Remove all exceptions")
-    remove_parser.add_argument(
-        "--server",
-        choices=["dev", "stage", "prod"],
-        required=True,
-        type=lowercase_arg,
-        help="The RemoteSettings server location (dev, stage, or prod)")
+    remove_parser.add_argument("--server", **_SERVER_ARGUMENT)
     remove_parser.add_argument(
         "--server-location",
         help="The server location to remove the exceptions from. If not provided, the default server location will be used."
@@ -129,8 +115,8 @@ async def execute():
         action="store_true",
         help="Skip confirmation prompts")
 
-    # Bugzilla list bugs info command
-    bz_parser = subparsers.add_parser('bz-info', help='Get bug info from Bugzilla')
+def _build_bz_info(bz_parser):
+    """Add the arguments of the `bz-info` command."""
     bz_parser.add_argument(
         "--product",
         default="Web Compatibility",
@@ -139,9 +125,13 @@ async def execute():
         "--component",
         default="Privacy: Site Reports",
         help="The component to get bug data for")
+    bz_parser.add_argument(
+        "--raw",
+        action="store_true",
+        help="Output the Bugzilla JSON response as is, without pretty-printing")
 
-    # Bugzilla NeedInfo command
-    ni_parser = subparsers.add_parser('bz-ni', help='Send NeedInfo on Bugzilla')
+def _build_bz_ni(ni_parser):
+    """Add the arguments of the `bz-ni` command."""
     ni_parser.add_argument(
         "--bug-id",
         help="The Bugzilla bug ID to close"
@@ -161,8 +151,8 @@ async def execute():
         help="The requestee to test NeedInfo and Bugzilla"
     )
 
-    # Bugzilla close bug command
-    close_parser = subparsers.add_parser('bz-close', help='Close bugs on Bugzilla')
+def _build_bz_close(close_parser):
+    """Add the arguments of the `bz-close` command."""
     close_parser.add_argument(
         "--bug-id",
         help="The Bugzilla bug ID to close"
@@ -182,14 +172,9 @@ async def execute():
         help="The message to close the bug"
     )
 
-    # Auto command
-    auto_parser = subparsers.add_parser('auto', help='Automatically generate exceptions from Bugzilla')
-    auto_parser.add_argument(
-        "--server",
-        choices=["dev", "stage", "prod"],
-        required=True,
-        type=lowercase_arg,
-        help="The RemoteSettings server location (dev, stage, or prod)")
+def _build_auto(auto_parser):
+    """Add the arguments of the `auto` command."""
+    auto_parser.add_argument("--server", **_SERVER_ARGUMENT)
     auto_parser.add_argument(
         "--server-location",
         help="The server location to deploy the exceptions to. If not provided, the default server location will be used."
@@ -209,88 +194,143 @@ async def execute():
         help="Skip confirmation prompts"
     )
 
+# Map each command to its help text and the function adding its arguments.
+_COMMANDS = {
+    'list': ('List all exceptions', _build_list),
+    'add': ('Add exceptions from a JSON file', _build_add),
+    'remove': ('Remove specific exceptions', _build_remove),
+    'bz-info': ('Get bug info from Bugzilla', _build_bz_info),
+    'bz-ni': ('Send NeedInfo on Bugzilla', _build_bz_ni),
+    'bz-close': ('Close bugs on Bugzilla', _build_bz_close),
+    'auto': ('Automatically generate exceptions from Bugzilla', _build_auto),
+}
+
+def build_parser(argv):
+    """
+    Build the command line parser.
+
+    Only the command selected in argv gets its arguments added; the other
+    commands are registered by name so they still show up in the help. If no
+    known command is given (e.g. for -h), all the commands are fully built.
+
+    Args:
+        argv: The command line arguments, without the program name
+
+    Returns:
+        A tuple of the parser and a dict mapping command names to subparsers
+    """
+    parser = argparse.ArgumentParser(description="Tool to manage UrlClassifier exceptions on the RemoteSetting server")
+    subparsers = parser.add_subparsers(dest='command', help='Available commands')
+
+    selected = argv[0] if argv else None
+    build_all = selected not in _COMMANDS
+
+    command_parsers = {}
+    for name, (help_text, build) in _COMMANDS.items():
+        command_parser = subparsers.add_parser(name, help=help_text)
+        if build_all or name == selected:
+            build(command_parser)
+        command_parsers[name] = command_parser
+
+    return parser, command_parsers
+
+async def execute():
+    """
+    Main execution function that parses command line arguments and executes the appropriate command.
+    """
+    parser, command_parsers = build_parser(sys.argv[1:])
+
     args = parser.parse_args()
     if not args.command:
         parser.print_help()
         return
 
+    # The command modules are imported lazily so that each command only pays
+    # for loading the dependencies it actually uses.
     if args.command == 'list':
-        if args.server_location:
-            server_location = args.server_location
-        else:
-            server_location = get_server_location_from_args(args)
+        from .remoteSettings import list_exceptions, print_exceptions
+
+        server_location = get_server_location_from_args(args)
         auth_token = args.auth
         remote_exceptions = await list_exceptions(server_location, auth_token)
 
         if args.json:
-            print(json.dumps(remote_exceptions, indent=2, sort_keys=True))
+            sys.stdout.write(jsonUtils.dumps(remote_exceptions, sort_keys=True) + "\n")
         else:
             print("\nURL Classifier Exceptions:")
             print("=" * 50)
-            for exception in remote_exceptions:
-                print_exception(exception)
+            print_exceptions(remote_exceptions)
             print("=" * 50)
             print(f"Total exceptions: {len(remote_exceptions)}")
     elif args.command == 'add':
-        if args.server_location:
-            server_location = args.server_location
-        else:
-            server_location = get_server_location_from_args(args)
+        from .remoteSettings import add_exceptions_from_file
+
+        server_location = get_server_location_from_args(args)
         auth_token = args.auth
-        with open(args.json_file, 'r') as f:
-            new_exceptions = json.load(f)
-        await add_exceptions(server_location, auth_token, new_exceptions, args.server == "dev", args.force)
+        await add_exceptions_from_file(server_location, auth_token, args.json_file, args.server == "dev", args.force)
     elif args.command == 'remove':
-        if args.server_location:
-            server_location = args.server_location
-        else:
-            server_location = get_server_location_from_args(args)
+        from .remoteSettings import remove_exceptions
+
+        server_location = get_server_location_from_args(args)
         auth_token = args.auth
         if args.all:
             await remove_exceptions(server_location, auth_token, remove_all=True, is_dev=args.server == "dev", force=args.force)
         elif not args.exception_ids:
-            remove_parser.error("Either --all or at least one exception_id must be provided")
+            command_parsers['remove'].error("Either --all or at least one exception_id must be provided")
         else:
             await remove_exceptions(server_location, auth_token, args.exception_ids, is_dev=args.server == "dev", force=args.force)
     elif args.command == 'bz-info':
-        bugs = fetch_bug_data(args.product, args.component)
-        print(json.dumps(bugs, indent=2, sort_keys=True))
-    elif args.command == 'auto':
-        if args.server_location:
-            server_location = args.server_location
+        from .bugzilla import fetch_bug_data
+
+        if args.raw:
+            sys.stdout.buffer.write(fetch_bug_data(args.product, args.component, raw=True))
+            sys.stdout.buffer.write(b"\n")
         else:
-            server_location = get_server_location_from_args(args)
+            bugs = fetch_bug_data(args.product, args.component)
+            print(jsonUtils.dumps(bugs, sort_keys=True))
+    elif args.command == 'auto':
+        from .auto import auto_deploy_exceptions
+        from .remoteSettings import close_http_session
+
+        server_location = get_server_location_from_args(args)
         auth_token = args.auth
 
-        await auto_deploy_exceptions(
-            server_location, auth_token, args.server == "prod", args.dry_run, args.force)
+        try:
+            await auto_deploy_exceptions(
+                server_location, auth_token, args.server == "prod", args.dry_run, args.force)
+        finally:
+            await close_http_session()
     elif args.command == 'bz-close':
+        from .asyncUtils import gather_bounded
+        from .bugzilla import close_bug, close_bug_async
+
         # Validate that either --bug-id or --bug-ids-file is provided
         if not args.bug_id and not args.bug_ids_file:
-            close_parser.error("Either --bug-id or --bug-ids-file must be provided")
+            command_parsers['bz-close'].error("Either --bug-id or --bug-ids-file must be provided")
         if args.bug_id and args.bug_ids_file:
-            close_parser.error("Only one of --bug-id or --bug-ids-file can be provided")
+            command_parsers['bz-close'].error("Only one of --bug-id or --bug-ids-file can be provided")
 
         if args.bug_id:
             close_bug(args.bug_id, args.resolution, args.message)
         else:
-            with open(args.bug_ids_file, 'r') as f:
-                bug_ids = f.read().splitlines()
-            for bug_id in bug_ids:
-                close_bug(bug_id, args.resolution, args.message)
+            bug_ids = read_bug_ids(args.bug_ids_file)
+            await gather_bounded(
+                close_bug_async(bug_id, args.resolution, args.message) for bug_id in bug_ids)
     elif args.command == 'bz-ni':
+        from .asyncUtils import gather_bounded
+        from .bugzilla import needInfo, needInfo_async
+
         if not args.bug_id and not args.bug_ids_file:
-            ni_parser.error("Either --bug-id or --bug-ids-file must be provided")
+            command_parsers['bz-ni'].error("Either --bug-id or --bug-ids-file must be provided")
         if args.bug_id and args.bug_ids_file:
-            ni_parser.error("Only one of --bug-id or --bug-ids-file can be provided")
+            command_parsers['bz-ni'].error("Only one of --bug-id or --bug-ids-file can be provided")
 
         if args.bug_id:
             needInfo(args.bug_id, args.message, args.requestee)
         else:
-            with open(args.bug_ids_file, 'r') as f:
-                bug_ids = f.read().splitlines()
-            for bug_id in bug_ids:
-                needInfo(bug_id, args.message, args.requestee)
+            bug_ids = read_bug_ids(args.bug_ids_file)
+            await gather_bounded(
+                needInfo_async(bug_id, args.message, args.requestee) for bug_id in bug_ids)
 
 def main():
     asyncio.run(execute())
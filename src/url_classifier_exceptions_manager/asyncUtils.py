@@ -0,0 +1,75 @@
+import asyncio
+import random
+
+from .constants import (
+    MAX_CONCURRENT_REQUESTS,
+    RETRY_BASE_DELAY,
+    RETRY_MAX_TRIES,
+)
+
+async def gather_bounded(coroutines, limit=MAX_CONCURRENT_REQUESTS, return_exceptions=False):
+    """
+    Run coroutines concurrently, with at most `limit` of them in flight.
+
+    Args:
+        coroutines: An iterable of coroutines to run
+        limit: The maximum number of coroutines running at the same time
+        return_exceptions: If True, exceptions are returned as results
+            instead of being raised
+
+    Returns:
+        The results of the coroutines, in order
+    """
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(coroutine):
+        async with semaphore:
+            return await coroutine
+
+    return await asyncio.gather(
+        *(run(coroutine) for coroutine in coroutines),
+        return_exceptions=return_exceptions)
+
+def _get_retry_after(exception):
+    """Return the Retry-After delay of a failed HTTP request, or 0."""
+    try:
+        return float(exception.response.headers["Retry-After"])
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return 0
+
+async def with_retry(coroutine_factory, should_retry, max_tries=RETRY_MAX_TRIES, base_delay=RETRY_BASE_DELAY):
+    """
+    Await a coroutine, retrying it with exponential backoff on failure.
+
+    Args:
+        coroutine_factory: A callable returning a new coroutine for each try
+        should_retry: A callable telling whether a raised exception is worth
+            retrying
+        max_tries: The maximum number of tries
+        base_delay: The delay in seconds before the first retry, doubled for
+            each following retry
+
+    Returns:
+        The result of the first successful try
+    """
+    for attempt in range(max_tries):
+        try:
+            return await coroutine_factory()
+        except Exception as e:
+            if attempt + 1 >= max_tries or not should_retry(e):
+                raise
+            delay = base_delay * 2 ** attempt * random.uniform(0.5, 1.5)
+            await asyncio.sleep(max(delay, _get_retry_after(e)))
+
+def discard_task(task):
+    """
+    Cancel a task whose result is no longer needed.
+
+    If the task already failed, its exception is retrieved so asyncio does
+    not log it as never retrieved.
+
+    Args:
+        task: The task to discard
+    """
+    task.cancel()
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
@@ -1,8 +1,16 @@
-import json
+import asyncio
+import operator
 
 from urllib.parse import urlparse
 
-from .bugzilla import fetch_bug_data, close_bug, needInfo, fetch_bug_creator
+from . import jsonUtils
+from .asyncUtils import gather_bounded
+from .bugzilla import (
+    fetch_bug_data,
+    close_bug_async,
+    needInfo_async,
+    fetch_bug_creator_async,
+)
 from .remoteSettings import list_exceptions, add_exceptions, get_deployed_records
 from .exceptionEntry import ExceptionEntry
 
@@ -10,7 +18,15 @@ from .constants import (
     PROD_SERVER_LOCATION,
 )
 
-def is_exempted_by_global_exceptions(host, exceptions):
+def entry_from_rs_record(record):
+    entry = ExceptionEntry()
+    entry.fromRSRecord(record)
+    return entry
+
+def get_global_blocking_exceptions(exceptions):
+    # Index the global blocking exceptions by the host of their
+    # "*://{host}/*" urlPattern. The first exception for a host wins.
+    global_blocking_exceptions = {}
     for e in exceptions:
         if e.isGlobalException() is False:
             continue
@@ -18,66 +34,73 @@ def is_exempted_by_global_exceptions(host, exceptions):
         if e.isBlockingEntry() is False:
             continue
 
-        if e.obj["urlPattern"] == f"*://{host}/*":
-            print(f"Warning: {host} is exempted by global exception {e.obj}")
-            return True
+        pattern = e.obj["urlPattern"]
+        if len(pattern) >= 6 and pattern.startswith("*://") and pattern.endswith("/*"):
+            global_blocking_exceptions.setdefault(pattern[4:-2], e)
 
-    return False
+    return global_blocking_exceptions
 
-def is_already_in_exception(bug_id, exceptions):
-    for e in exceptions:
-        if str(bug_id) in e.obj["bugIds"]:
-            return True
-    return False
+def is_exempted_by_global_exceptions(host, global_blocking_exceptions):
+    e = global_blocking_exceptions.get(host)
+    if e is None:
+        return False
+
+    print(f"Warning: {host} is exempted by global exception {e.obj}")
+    return True
 
 async def auto_deploy_exceptions(server_location, auth_token, is_prod_server, dry_run=False, force=False):
 
     print(f"Executing auto deploy exceptions for server {server_location} with is_prod_server {is_prod_server} and dry_run {dry_run} and force {force}")
 
-    bugs_data = fetch_bug_data("Web Compatibility", "Privacy: Site Reports")
-    rs_records = await list_exceptions(server_location, auth_token)
-    deployed_records = await get_deployed_records("prod" if is_prod_server else "stage")
+    # The three fetches are independent, run them concurrently.
+    (bugs_data, rs_records, deployed_records) = await asyncio.gather(
+        asyncio.to_thread(fetch_bug_data, "Web Compatibility", "Privacy: Site Reports"),
+        list_exceptions(server_location, auth_token),
+        get_deployed_records("prod" if is_prod_server else "stage"))
 
     # Create a list of ExceptionEntry objects from the RemoteSettings records
-    current_exceptions = []
-    for record in rs_records:
-        entry = ExceptionEntry()
-        entry.fromRSRecord(record)
-        current_exceptions.append(entry)
+    current_exceptions = [entry_from_rs_record(record) for record in rs_records]
+    deployed_exceptions = [entry_from_rs_record(record) for record in deployed_records]
 
-    deployed_exceptions = []
-    for record in deployed_records:
-        entry = ExceptionEntry()
-        entry.fromRSRecord(record)
-        deployed_exceptions.append(entry)
+    # Collect the bug IDs covered by the exceptions, so checking a bug is a set
+    # lookup. Bug IDs are stored as strings in the entries.
+    current_bug_ids = {bug_id for e in current_exceptions for bug_id in e.obj["bugIds"]}
+    deployed_bug_ids = {bug_id for e in deployed_exceptions for bug_id in e.obj["bugIds"]}
+    global_blocking_exceptions = get_global_blocking_exceptions(current_exceptions)
 
     bugs_need_exception = []
     bugs_have_exception = []
     new_exceptions = []
 
-    for entry in sorted(bugs_data["bugs"], key=lambda x: x["id"], reverse=True):
+    # Only bugs diagnosed by the privacy team that are not "REOPENED" are
+    # candidates. Filter them before sorting, so only the candidates get
+    # sorted.
+    candidates = [
+        bug for bug in bugs_data["bugs"]
+        if "[privacy-team:diagnosed]" in bug["whiteboard"] and bug["status"] != "REOPENED"
+    ]
+    candidates.sort(key=operator.itemgetter("id"), reverse=True)
+
+    for entry in candidates:
         bug_id = entry["id"]
         url = entry["url"]
         whiteboard = entry["whiteboard"]
         user_story = entry["cf_user_story"]
 
-        # Skip if the bug is not diagnosed by the privacy team
-        if "[privacy-team:diagnosed]" not in whiteboard:
-            continue
-
-        # Skip if the bug has the status "REOPENED"
-        if entry["status"] == "REOPENED":
-            continue
-
         # Skip if the entries are already in the RemoteSettings server. Also
         # record bugs that have exceptions deployed.
-        if is_already_in_exception(bug_id, current_exceptions):
-            if is_prod_server and is_already_in_exception(bug_id, deployed_exceptions):
+        if str(bug_id) in current_bug_ids:
+            if is_prod_server and str(bug_id) in deployed_bug_ids:
                 bugs_have_exception.append(bug_id)
             continue
 
-        # Skip if the category hasn't been set.
-        if "[exception-baseline]" not in whiteboard and "[exception-convenience]" not in whiteboard:
+        # Get the category from the whiteboard tag. Skip if the category
+        # hasn't been set.
+        if "[exception-baseline]" in whiteboard:
+            category = "baseline"
+        elif "[exception-convenience]" in whiteboard:
+            category = "convenience"
+        else:
             continue
 
         url = entry["url"]
@@ -87,58 +110,58 @@ async def auto_deploy_exceptions(server_location, auth_token, is_prod_server, dr
 
         url = f"*://{urlparse(url).netloc}/*"
 
-        # Get the category from the whiteboard tag
-        category = "convenience"
-        if "[exception-baseline]" in whiteboard:
-            category = "baseline"
-        elif "[exception-convenience]" in whiteboard:
-            category = "convenience"
-
         classifierFeatures = ["tracking-protection", "emailtracking-protection"]
         domains_to_fix = []
 
         # Parse the user story to find the necessary fix domains and classifier
-        # features
-        for (idx,line) in enumerate(user_story.splitlines()):
+        # features. Stop once both lines have been seen.
+        seen_trackers = False
+        seen_features = False
+        for line in user_story.splitlines():
             if line.startswith("trackers-blocked:"):
-                (_, hosts) = line.split(":", 2)
-                domains_to_fix = hosts.split(",")
+                seen_trackers = True
+                (_, hosts) = line.split(":", 1)
 
-                # Filter out domains that are exempted by global exceptions
-                domains_to_fix = [host for host in domains_to_fix if not is_exempted_by_global_exceptions(host, current_exceptions)]
+                # Wrap the hosts into url patterns in one pass, filtering out
+                # empty hosts and hosts exempted by global exceptions.
+                domains_to_fix = [
+                    f"*://{host}/*"
+                    for host in (h.strip() for h in hosts.split(","))
+                    if host and not is_exempted_by_global_exceptions(host, global_blocking_exceptions)
+                ]
 
                 if not domains_to_fix:
                     print(f"Warning: Ignoring Bug {bug_id}, covered by global exceptions?")
-                    continue
-
-                domains_to_fix = [f"*://{domain.strip()}/*" for domain in domains_to_fix]
-
-            if line.startswith("classifier-features:"):
-                (_, features) = line.split(":", 2)
+            elif line.startswith("classifier-features:"):
+                seen_features = True
+                (_, features) = line.split(":", 1)
                 classifierFeatures = features.split(",")
 
+            if seen_trackers and seen_features:
+                break
+
         if not domains_to_fix:
             continue
 
         bugs_need_exception.append(bug_id)
         for domain in domains_to_fix:
+            template = {
+                "bugIds": [str(bug_id)],
+                "urlPattern": domain,
+                "classifierFeatures": classifierFeatures,
+                "category": category,
+                "topLevelUrlPattern": url,
+            }
             entryAfter142 = ExceptionEntry()
-            entryAfter142.fromArguments(
-                bugIds=[str(bug_id)],
-                urlPattern=domain,
-                classifierFeatures=classifierFeatures,
-                category=category,
-                topLevelUrlPattern=url,
+            entryAfter142.fromTemplate(
+                template,
                 filter_expression='env.version|versionCompare("142.0a1") >= 0'
             )
             new_exceptions.append(entryAfter142)
             entryBefore142 = ExceptionEntry()
-            entryBefore142.fromArguments(
-                bugIds=[str(bug_id)],
-                urlPattern=domain,
-                classifierFeatures=classifierFeatures,
+            entryBefore142.fromTemplate(
+                template,
                 category="convenience",
-                topLevelUrlPattern=url,
                 isPrivateBrowsingOnly=True,
                 filterContentBlockingCategories=["standard"],
                 filter_expression='env.version|versionCompare("142.0a1") < 0'
@@ -148,7 +171,7 @@ async def auto_deploy_exceptions(server_location, auth_token, is_prod_server, dr
     new_exceptions_objects = [exc.toObject() for exc in new_exceptions]
 
     print("New exceptions:")
-    print(json.dumps(new_exceptions_objects, indent=2))
+    print(jsonUtils.dumps(new_exceptions_objects))
 
     print("Bugs that will get exceptions deployed:")
     print(bugs_need_exception)
@@ -166,31 +189,34 @@ async def auto_deploy_exceptions(server_location, auth_token, is_prod_server, dr
     print("Closing bugs that have exceptions deployed...")
     print(bugs_have_exception)
     # Start closing bugs that have exceptions deployed.
-    await auto_close_bugs(auth_token, bugs_have_exception, dry_run)
+    await auto_close_bugs(auth_token, bugs_have_exception, deployed_records, dry_run)
 
     print("Needinfo bugs that have exceptions deployed...")
     # Start needinfo bugs that have exceptions deployed.
     await auto_ni_bugs(bugs_have_exception, dry_run)
 
-async def auto_close_bugs(auth_token, bug_list, dry_run=False):
-    # First, fetch the RemoteSettings records. We need them to check if the
-    # Record for the bug is already in the RemoteSettings server.
-    # We only check against the prod server for closing bugs.
-    rs_records = await get_deployed_records("prod")
+async def auto_close_bugs(auth_token, bug_list, deployed_records, dry_run=False):
+    # The deployed records are used to check if the record for the bug is
+    # already in the RemoteSettings server. The caller passes the records
+    # deployed on prod, we only check against the prod server for closing
+    # bugs.
 
+    # Index the entries by the bug IDs they contain, so finding the entries of
+    # a bug is a single lookup.
+    entries_by_bug_id = {}
+    for record in deployed_records:
+        entry = entry_from_rs_record(record)
+        # Remove the id field from the entry object. This field is not
+        # necessary for the message body.
+        if "id" in entry.obj:
+            del entry.obj["id"]
+        for entry_bug_id in set(entry.obj["bugIds"]):
+            entries_by_bug_id.setdefault(entry_bug_id, []).append(entry)
+
+    bugs_to_close = []
     for bug_id in bug_list:
         # Find all entries that contain this bug_id
-        matching_entries = []
-        for record in rs_records:
-            entry = ExceptionEntry()
-            entry.fromRSRecord(record)
-            # Remove the id field from the entry object. This field is not
-            # necessary for the message body.
-            if "id" in entry.obj:
-                del entry.obj["id"]
-            # Check if the bug_id is in the entry.bugIds list.
-            if str(bug_id) in entry.obj["bugIds"]:
-                matching_entries.append(entry)
+        matching_entries = entries_by_bug_id.get(str(bug_id), [])
 
         if not matching_entries:
             print(f"Warning: Bug {bug_id} not found in the RemoteSettings server.")
@@ -210,16 +236,31 @@ async def auto_close_bugs(auth_token, bug_list, dry_run=False):
             print(message)
             print(f"------------------------------")
         else:
-            close_bug(bug_id, "FIXED", message)
+            bugs_to_close.append((bug_id, message))
+
+    # Close the bugs concurrently.
+    await gather_bounded(
+        close_bug_async(bug_id, "FIXED", message) for (bug_id, message) in bugs_to_close)
 
 async def auto_ni_bugs(bug_list, dry_run=False):
-    for bug_id in bug_list:
-        message = f"This message is auto-generated.\n\n"
-        message += f"Would you please verify if the issue is resolved by the ETP exceptions? Really appreciate your help.\n"
+    message = f"This message is auto-generated.\n\n"
+    message += f"Would you please verify if the issue is resolved by the ETP exceptions? Really appreciate your help.\n"
+
+    # Fetch the bug creators concurrently.
+    creators = await gather_bounded(
+        fetch_bug_creator_async(bug_id) for bug_id in bug_list)
 
+    bugs_to_ni = []
+    for (bug_id, creator) in zip(bug_list, creators):
         if dry_run:
-            print(f"---- NeedInfo Bug {bug_id} to {fetch_bug_creator(bug_id)} ----")
+            print(f"---- NeedInfo Bug {bug_id} to {creator} ----")
             print(message)
             print(f"------------------------------")
+        elif creator is None:
+            print(f"Warning: Bug {bug_id} has no creator, skipping NeedInfo.")
         else:
-            needInfo(bug_id, message, fetch_bug_creator(bug_id))
\ No newline at end of file
+            bugs_to_ni.append((bug_id, creator))
+
+    # NeedInfo the bug creators concurrently.
+    await gather_bounded(
+        needInfo_async(bug_id, message, creator) for (bug_id, creator) in bugs_to_ni)
@@ -1,9 +1,48 @@
 from bugsy import Bugsy
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+import asyncio
+import functools
 import sys
 import os
 
-def fetch_bug_data(product, component):
-    bugsy = Bugsy()
+from .constants import (
+    RETRY_BASE_DELAY,
+    RETRY_MAX_TRIES,
+)
+
+@functools.lru_cache(maxsize=None)
+def get_bugsy(api_key=None):
+    """
+    Return a Bugsy client for the given API key.
+
+    Clients are shared so that their HTTP session, and its connection pool,
+    is reused across requests. Rate limited (429) and 5xx responses to GET
+    requests are retried with exponential backoff, honoring Retry-After.
+    PUT requests post comments, a retry after the server already applied
+    one would post it twice, so they are only retried on connection errors.
+    """
+    bugsy = Bugsy(api_key=api_key)
+    retries = Retry(
+        total=RETRY_MAX_TRIES - 1,
+        backoff_factor=RETRY_BASE_DELAY,
+        backoff_jitter=RETRY_BASE_DELAY,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset({"GET"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    bugsy.session.mount("https://", HTTPAdapter(max_retries=retries))
+    return bugsy
+
+def fetch_bug_data(product, component, raw=False):
+    """
+    Fetch the open bugs of a Bugzilla product and component.
+
+    If raw is True, the JSON response body is returned as bytes, without
+    being parsed.
+    """
+    bugsy = get_bugsy()
 
     params = {
         "product": product,
@@ -13,10 +52,17 @@ def fetch_bug_data(product, component):
         "include_fields": "id,last_change_time,summary,platform,url,whiteboard,status,resolution,severity,priority,cf_user_story,comments",
     }
 
+    if raw:
+        response = bugsy.session.get(
+            f"{bugsy.bugzilla_url}/bug", params=params,
+            headers={"User-Agent": "Bugsy"})
+        response.raise_for_status()
+        return response.content
+
     return bugsy.request("bug", params=params)
 
 def fetch_bug_creator(bugId):
-    bugsy = Bugsy()
+    bugsy = get_bugsy()
 
     params = {
         "include_fields": "creator",
@@ -29,9 +75,11 @@ def fetch_bug_creator(bugId):
     else:
         return None
 
+async def fetch_bug_creator_async(bugId):
+    return await asyncio.to_thread(fetch_bug_creator, bugId)
+
 def close_bug(bugId, resolution, message):
-    api_key = os.getenv("BZ_API_KEY")
-    bugsy = Bugsy(api_key=api_key)
+    bugsy = get_bugsy(os.getenv("BZ_API_KEY"))
 
     json_data = {
         "status": "RESOLVED",
@@ -48,9 +96,11 @@ def close_bug(bugId, resolution, message):
     except Exception as e:
         print(f"Error closing bug {bugId}: {e}", file=sys.stderr)
 
+async def close_bug_async(bugId, resolution, message):
+    await asyncio.to_thread(close_bug, bugId, resolution, message)
+
 def needInfo(bugId, message, requestee):
-    api_key = os.getenv("BZ_API_KEY")
-    bugsy = Bugsy(api_key=api_key)
+    bugsy = get_bugsy(os.getenv("BZ_API_KEY"))
 
     json_data = {
        "flags": [
@@ -72,3 +122,5 @@ def needInfo(bugId, message, requestee):
     except Exception as e:
         print(f"Error needInfo {requestee} for bug {bugId}: {e}", file=sys.stderr)
 
+async def needInfo_async(bugId, message, requestee):
+    await asyncio.to_thread(needInfo, bugId, message, requestee)
@@ -2,8 +2,24 @@ DEV_SERVER_LOCATION = "https://remote-settings-dev.allizom.org/v1"
 STAGE_SERVER_LOCATION = "https://remote-settings.allizom.org/v1"
 PROD_SERVER_LOCATION = "https://remote-settings.mozilla.org/v1"
 
+SERVER_LOCATIONS = {
+    "dev": DEV_SERVER_LOCATION,
+    "stage": STAGE_SERVER_LOCATION,
+    "prod": PROD_SERVER_LOCATION,
+}
+
 REMOTE_SETTINGS_BUCKET = "main-workspace"
 REMOTE_SETTINGS_COLLECTION = "url-classifier-exceptions"
 
 PROD_RECORDS_LOCATION = "https://firefox.settings.services.mozilla.com/v1/buckets/main/collections/url-classifier-exceptions/records"
 STAGE_RECORDS_LOCATION = "https://firefox.settings.services.allizom.org/v1/buckets/main/collections/url-classifier-exceptions/records"
+
+# Maximum number of requests in flight to a single server. This matches
+# Firefox's default network.http.max-persistent-connections-per-server.
+MAX_CONCURRENT_REQUESTS = 6
+
+# Retry policy for requests failing with a rate limit (429) or server (5xx)
+# error. The delay before retry n (from 0) is RETRY_BASE_DELAY * 2 ** n
+# seconds, jittered, or the server's Retry-After if longer.
+RETRY_MAX_TRIES = 4
+RETRY_BASE_DELAY = 0.5
@@ -1,8 +1,15 @@
-import json
+from . import jsonUtils
 
 class ExceptionEntry():
+    # Many entries are created per run, avoid a __dict__ for each of them.
+    __slots__ = ("obj", "_global", "_blocking")
+
     def __init__(self):
         self.obj = {}
+        # Cached results of isGlobalException() and isBlockingEntry(),
+        # updated whenever the entry gets populated.
+        self._global = True
+        self._blocking = False
 
     def fromRSRecord(self, record):
         bugIds = []
@@ -31,6 +38,8 @@ class ExceptionEntry():
         if "filter_expression" in record:
             self.obj["filter_expression"] = record["filter_expression"]
 
+        self._updateFlags()
+
     def fromArguments(self, bugIds, urlPattern, classifierFeatures,
                       category = "convenience", topLevelUrlPattern=None,
                       isPrivateBrowsingOnly=None,
@@ -52,20 +61,31 @@ class ExceptionEntry():
         if filter_expression is not None:
             self.obj["filter_expression"] = filter_expression
 
+        self._updateFlags()
+
+    def fromTemplate(self, template, **overrides):
+        # Copy the fields of a template object, replacing the given ones. This
+        # is used to emit several entries sharing most of their fields.
+        self.obj = {**template, **overrides}
+
+        self._updateFlags()
+
+    def _updateFlags(self):
+        self._global = "topLevelUrlPattern" not in self.obj
+        self._blocking = any(feature.endswith("-protection")
+                             for feature in self.obj["classifierFeatures"])
+
     def toJSON(self):
-        return json.dumps(self.obj, indent=2)
+        return jsonUtils.dumps(self.obj)
 
     def toObject(self):
         return self.obj
 
     def isGlobalException(self):
-        return "topLevelUrlPattern" not in self.obj
+        return self._global
 
     def isEntryAfter142(self):
         return "filter_expression" in self.obj and self.obj["filter_expression"] == 'env.version|versionCompare("142.0a1") >= 0'
 
     def isBlockingEntry(self):
-        for feature in self.obj["classifierFeatures"]:
-            if feature.endswith("-protection"):
-                return True
-        return False
\ No newline at end of file
+        return self._blocking
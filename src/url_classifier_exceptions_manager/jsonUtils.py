@@ -0,0 +1,43 @@
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def dumps(obj, sort_keys=False):
+    """
+    Serialize an object to a JSON string indented by two spaces.
+
+    orjson is used when it is installed, the json module otherwise.
+
+    Args:
+        obj: The object to serialize
+        sort_keys: If True, sort the keys of the objects
+
+    Returns:
+        The JSON string
+    """
+    if orjson is None:
+        return json.dumps(obj, indent=2, sort_keys=sort_keys, ensure_ascii=False)
+
+    option = orjson.OPT_INDENT_2
+    if sort_keys:
+        option |= orjson.OPT_SORT_KEYS
+    return orjson.dumps(obj, option=option).decode()
+
+def loads(data):
+    """
+    Deserialize a JSON document.
+
+    orjson is used when it is installed, the json module otherwise.
+
+    Args:
+        data: The JSON document, as str or bytes
+
+    Returns:
+        The deserialized object
+    """
+    if orjson is None:
+        return json.loads(data)
+    return orjson.loads(data)
@@ -1,19 +1,37 @@
-import json
+import asyncio
+import logging
+import sys
 import uuid
+import weakref
 import aiohttp
 
-from kinto_http import AsyncClient, KintoException
+from kinto_http import AsyncClient, Client, KintoBatchException, KintoException
 from .constants import (
     REMOTE_SETTINGS_BUCKET,
     REMOTE_SETTINGS_COLLECTION,
     PROD_RECORDS_LOCATION,
     STAGE_RECORDS_LOCATION,
 )
+from . import jsonUtils
+from .asyncUtils import discard_task, with_retry
+
+# kinto_http logs every successful batch sub-request as a warning.
+logging.getLogger("kinto_http.batch").setLevel(logging.ERROR)
+
+# Record fields copied by parse_rs_record only when the record has them.
+OPTIONAL_RECORD_FIELDS = (
+    "topLevelUrlPattern",
+    "isPrivateBrowsingOnly",
+    "filterContentBlockingCategories",
+    "filter_expression",
+)
 
-def confirm_action(action_description, force=False):
+async def confirm_action(action_description, force=False):
     """
     Prompt the user for confirmation before proceeding with an action.
 
+    The prompt is read in a worker thread so it doesn't block the event loop.
+
     Args:
         action_description: A description of the action to be performed
         force: If True, skip confirmation and proceed automatically
@@ -24,18 +42,23 @@ def confirm_action(action_description, force=False):
     if force:
         return True
 
-    confirmation = input(f"\nAre you sure you want to {action_description}? (y/n): ")
+    confirmation = await asyncio.get_running_loop().run_in_executor(
+        None, input, f"\nAre you sure you want to {action_description}? (y/n): ")
     return confirmation.lower() in ('y', 'yes')
 
-def print_exception(exception):
+def print_exceptions(exceptions):
     """
-    Print a single exception in JSON format.
+    Print exceptions in JSON format, each followed by a separator line.
+
+    The output is built first and written with a single call.
 
     Args:
-        exception: The exception record to print
+        exceptions: The exception records to print
     """
-    print(json.dumps(exception, indent=2, sort_keys=True))
-    print("-" * 50)
+    separator = "\n" + "-" * 50 + "\n"
+    sys.stdout.write("".join(
+        jsonUtils.dumps(exception, sort_keys=True) + separator
+        for exception in exceptions))
 
 def parse_rs_record(record):
     """
@@ -63,48 +86,109 @@ def parse_rs_record(record):
     }
 
     # Add optional fields only if they exist in the source record
-    if "topLevelUrlPattern" in record:
-        parsed_record["topLevelUrlPattern"] = record["topLevelUrlPattern"]
+    for field in OPTIONAL_RECORD_FIELDS:
+        if field in record:
+            parsed_record[field] = record[field]
 
-    if "isPrivateBrowsingOnly" in record:
-        parsed_record["isPrivateBrowsingOnly"] = record["isPrivateBrowsingOnly"]
+    return parsed_record
 
-    if "filterContentBlockingCategories" in record:
-        parsed_record["filterContentBlockingCategories"] = record["filterContentBlockingCategories"]
+def is_retryable_error(exception):
+    """
+    Tell whether a failed RemoteSettings request is worth retrying.
 
-    if "filter_expression" in record:
-        parsed_record["filter_expression"] = record["filter_expression"]
+    Args:
+        exception: The exception raised by the request
 
-    return parsed_record
+    Returns:
+        True if the server rate limited the request or failed with a 5xx error
+    """
+    if isinstance(exception, KintoBatchException):
+        return all(is_retryable_error(e) for e in exception.exceptions)
+    if not isinstance(exception, KintoException) or exception.response is None:
+        return False
+    status = exception.response.status_code
+    return status == 429 or status >= 500
+
+def exception_match_key(exception):
+    """
+    Build the key used to match an exception against the remote ones.
+
+    Two exceptions with the same key target the same pattern for the same
+    bugs, regardless of their id and of the order of their list fields.
+
+    Args:
+        exception: The exception record
+
+    Returns:
+        A hashable tuple identifying the exception
+    """
+    return (
+        exception["urlPattern"],
+        frozenset(exception["bugIds"]),
+        frozenset(exception["classifierFeatures"]),
+        frozenset(exception.get("filterContentBlockingCategories", ())),
+    )
+
+def get_batch_client(async_client):
+    """
+    Get a synchronous client sharing the session of an AsyncClient.
+
+    AsyncClient does not support batch operations, its batch() only works by
+    accident and sends the batch on the event loop thread. Batches are built
+    on this client instead, in a worker thread.
+
+    Args:
+        async_client: The AsyncClient instance for the server
+
+    Returns:
+        A Client for the same server, bucket and collection
+    """
+    return Client(
+        session=async_client.session,
+        bucket=async_client.bucket_name,
+        collection=async_client.collection_name,
+    )
 
 async def update_records(async_client, records):
     """
     Update or create records in the RemoteSettings server.
-    
+
+    All the records are sent in a single batch request.
+
     Args:
         async_client: The AsyncClient instance for the server
         records: List of records to update or create
 
     Returns:
-        The response from the server if successful, None otherwise
+        The batch responses from the server if successful, None otherwise
     """
+    if not records:
+        return None
+
+    # Normalize all the records before any request is made. bugId is
+    # dropped, always use bugIds, and the category defaults to
+    # "convenience". The records of the caller are left untouched.
+    records = [
+        {**{k: v for k, v in data.items() if k != "bugId"},
+         "category": data.get("category", "convenience")}
+        for data in records
+    ]
+
+    batch_client = get_batch_client(async_client)
+
+    def send_batch():
+        with batch_client.batch() as batch:
+            for data in records:
+                batch.update_record(id=data['id'], data=data)
+        return batch.results()
+
     try:
-        for data in records:
-            # Remove bugId if present, always use bugIds
-            if "bugId" in data:
-                del data["bugId"]
-            # Ensure category is present
-            if "category" not in data:
-                data["category"] = "convenience"
-            rec_resp = await async_client.update_record(id=data['id'],
-                data=data)
-            if not rec_resp:
-                print('Failed to create/update record for %s. Error: %s' %
-                    (data['Name'], rec_resp.content.decode()))
-                return rec_resp
+        return await with_retry(lambda: asyncio.to_thread(send_batch), is_retryable_error)
+    except KintoBatchException as e:
+        for error in e.exceptions:
+            print(f"Failed to create/update record. Error: {error}")
     except KintoException as e:
-        print('Failed to create/update record for {0}. Error: {1}'
-            .format(data['Name'], e))
+        print(f"Failed to create/update records {[data.get('id', '<no-id>') for data in records]}. Error: {e}")
 
 async def request_review(async_client, is_dev):
     """
@@ -132,9 +216,16 @@ async def request_review(async_client, is_dev):
     else:
         print("\n*** Error while fetching collection status ***\n")
 
+# AsyncClients created by get_async_client, keyed by event loop, then by
+# server location and auth token. The entries of a loop go away with it.
+_async_clients = weakref.WeakKeyDictionary()
+
 def get_async_client(server_location, auth_token):
     """
-    Create an asynchronous client for interacting with RemoteSettings.
+    Get an asynchronous client for interacting with RemoteSettings.
+
+    Clients are cached per running event loop, server and auth token, so the
+    commands share one client, along with the server settings it caches.
 
     Args:
         server_location: The URL of the RemoteSettings server
@@ -143,30 +234,66 @@ def get_async_client(server_location, auth_token):
     Returns:
         An AsyncClient instance configured for the specified server
     """
-    return AsyncClient(
-        server_url=server_location,
-        auth=auth_token,
-        bucket=REMOTE_SETTINGS_BUCKET,
-        collection=REMOTE_SETTINGS_COLLECTION,
-    )
-
-async def get_exceptions(server_location, auth_token):
+    loop_clients = _async_clients.setdefault(asyncio.get_running_loop(), {})
+    key = (server_location, auth_token)
+    async_client = loop_clients.get(key)
+    if async_client is None:
+        async_client = AsyncClient(
+            server_url=server_location,
+            auth=auth_token,
+            bucket=REMOTE_SETTINGS_BUCKET,
+            collection=REMOTE_SETTINGS_COLLECTION,
+        )
+        loop_clients[key] = async_client
+    return async_client
+
+async def get_exceptions(server_location, auth_token, async_client=None):
     """
     Retrieve all exceptions from the RemoteSettings server.
 
     Args:
         server_location: The URL of the RemoteSettings server
         auth_token: Authentication token for the server
+        async_client: An existing AsyncClient to reuse (optional)
 
     Returns:
         A list of parsed exception records
     """
-    async_client = get_async_client(server_location, auth_token)
+    if async_client is None:
+        async_client = get_async_client(server_location, auth_token)
 
     records = await async_client.get_records()
     remote_exceptions = [parse_rs_record(r) for r in records]
     return remote_exceptions
 
+async def get_exceptions_indexed(server_location, auth_token, async_client=None):
+    """
+    Retrieve all exceptions from the RemoteSettings server, indexed for
+    matching.
+
+    The records are parsed and indexed in a single pass. If two records share
+    a match key, the first one is indexed.
+
+    Args:
+        server_location: The URL of the RemoteSettings server
+        auth_token: Authentication token for the server
+        async_client: An existing AsyncClient to reuse (optional)
+
+    Returns:
+        A tuple of a dict of the parsed exception records by id, and a dict
+        of them by exception_match_key
+    """
+    if async_client is None:
+        async_client = get_async_client(server_location, auth_token)
+
+    by_id = {}
+    by_key = {}
+    for record in await async_client.get_records():
+        exception = parse_rs_record(record)
+        by_id[exception["id"]] = exception
+        by_key.setdefault(exception_match_key(exception), exception)
+    return (by_id, by_key)
+
 async def list_exceptions(server_location, auth_token):
     """
     List all exceptions from the RemoteSettings server.
@@ -178,42 +305,82 @@ async def list_exceptions(server_location, auth_token):
     """
     return await get_exceptions(server_location, auth_token)
 
-async def add_exceptions(server_location, auth_token, new_exceptions, is_dev, force=False):
+def load_exceptions(json_file):
+    """
+    Load exceptions from a JSON file.
+
+    Args:
+        json_file: Path to the JSON file containing the exceptions
+
+    Returns:
+        The list of exceptions
+    """
+    with open(json_file, 'rb') as f:
+        return jsonUtils.loads(f.read())
+
+async def add_exceptions_from_file(server_location, auth_token, json_file, is_dev, force=False):
     """
     Add new exceptions or update existing ones from a JSON file.
 
+    The remote exceptions are fetched while the file is being read.
+
+    Args:
+        server_location: The URL of the RemoteSettings server
+        auth_token: Authentication token for the server
+        json_file: Path to the JSON file containing the exceptions to add
+        is_dev: Boolean indicating if the server is a development server
+        force: If True, skip confirmation prompts
+    """
+    async_client = get_async_client(server_location, auth_token)
+    remote_exceptions_task = asyncio.create_task(
+        get_exceptions_indexed(server_location, auth_token, async_client))
+
+    try:
+        new_exceptions = await asyncio.get_running_loop().run_in_executor(
+            None, load_exceptions, json_file)
+    except BaseException:
+        discard_task(remote_exceptions_task)
+        raise
+
+    await add_exceptions(server_location, auth_token, new_exceptions, is_dev,
+                         force, remote_exceptions_task)
+
+async def add_exceptions(server_location, auth_token, new_exceptions, is_dev, force=False, remote_exceptions_task=None):
+    """
+    Add new exceptions or update existing ones.
+
     Args:
         server_location: The URL of the RemoteSettings server
         auth_token: Authentication token for the server
         new_exceptions: List of exceptions to add
         is_dev: Boolean indicating if the server is a development server
         force: If True, skip confirmation prompts
+        remote_exceptions_task: An already started get_exceptions_indexed
+            task to use instead of fetching the remote exceptions (optional)
     """
+    if not new_exceptions:
+        if remote_exceptions_task is not None:
+            discard_task(remote_exceptions_task)
+        print("\nNo exceptions to add.\n")
+        return
+
     async_client = get_async_client(server_location, auth_token)
-    remote_exceptions = await get_exceptions(server_location, auth_token)
 
     to_create = []
     to_update = []
 
+    if remote_exceptions_task is None:
+        remote_exceptions_task = get_exceptions_indexed(
+            server_location, auth_token, async_client)
+    (remote_by_id, remote_by_key) = await remote_exceptions_task
+
     for exception in new_exceptions:
-        # Initialize variable to track if we find a matching exception
-        matching_remote = None
-        # Search through existing remote exceptions
-        for remote_exception in remote_exceptions:
-            # Match exceptions. If the id is the same, it's a match. Otherwise,
-            # we check urlPattern, bugIds, and classifierFeatures to determine if
-            # it's a match.
-            if "id" in exception and exception["id"] == remote_exception["id"]:
-                matching_remote = remote_exception
-                break
-            elif (
-                exception["urlPattern"] == remote_exception["urlPattern"] and
-                set(exception["bugIds"]) == set(remote_exception["bugIds"]) and
-                set(exception["classifierFeatures"]) == set(remote_exception["classifierFeatures"]) and
-                set(exception["filterContentBlockingCategories"]) == set(remote_exception["filterContentBlockingCategories"])
-            ):
-                matching_remote = remote_exception
-                break
+        # Match exceptions. If the id is the same, it's a match. Otherwise,
+        # we check urlPattern, bugIds, classifierFeatures, and
+        # filterContentBlockingCategories to determine if it's a match.
+        matching_remote = remote_by_id.get(exception.get("id"))
+        if matching_remote is None:
+            matching_remote = remote_by_key.get(exception_match_key(exception))
 
         if matching_remote:
             # For existing exceptions, copy the ID and add to update list
@@ -233,18 +400,16 @@ async def add_exceptions(server_location, auth_token, new_exceptions, is_dev, fo
     if to_create:
         print("\nExceptions to be added:")
         print("=" * 50)
-        for exception in to_create:
-            print_exception(exception)
+        print_exceptions(to_create)
 
     # Display exceptions that will be updated
     if to_update:
         print("\nExceptions to be updated:")
         print("=" * 50)
-        for exception in to_update:
-            print_exception(exception)
+        print_exceptions(to_update)
 
     action_description = f"add new exceptions and update existing ones"
-    if not confirm_action(action_description, force):
+    if not await confirm_action(action_description, force):
         print("Operation cancelled.")
         return
 
@@ -271,7 +436,7 @@ async def remove_exceptions(server_location, auth_token, exception_ids=None, rem
     if remove_all:
         # Get all records and delete them
         action_description = "remove ALL exceptions from the server"
-        if not confirm_action(action_description, force):
+        if not await confirm_action(action_description, force):
             print("Operation cancelled.")
             return
 
@@ -284,13 +449,24 @@ async def remove_exceptions(server_location, auth_token, exception_ids=None, rem
         print(f"Successfully removed all exceptions")
     else:
         action_description = f"remove {len(exception_ids)} exception(s)"
-        if not confirm_action(action_description, force):
+        if not await confirm_action(action_description, force):
             print("Operation cancelled.")
             return
 
+        # Send all the deletions in a single batch request.
+        batch_client = get_batch_client(async_client)
+
+        def send_batch():
+            with batch_client.batch() as batch:
+                for exception_id in exception_ids:
+                    batch.delete_record(id=exception_id)
+
         try:
-            for exception_id in exception_ids:
-                await async_client.delete_record(id=exception_id)
+            await with_retry(lambda: asyncio.to_thread(send_batch), is_retryable_error)
+        except KintoBatchException as e:
+            for error in e.exceptions:
+                print(f"Error removing exception: {error}")
+            return
         except KintoException as e:
             print(f"Error removing exceptions: {e}")
             return
@@ -298,6 +474,35 @@ async def remove_exceptions(server_location, auth_token, exception_ids=None, rem
 
     await request_review(async_client, is_dev)
 
+# aiohttp ClientSessions created by get_http_session, keyed by event loop.
+# A session references its loop, so close_http_session drops the entry.
+_http_sessions = weakref.WeakKeyDictionary()
+
+def get_http_session():
+    """
+    Get the aiohttp session used to download the deployed records.
+
+    Sessions are cached per running event loop, so repeated downloads reuse
+    the connections, DNS cache and TLS sessions of one session.
+
+    Returns:
+        A ClientSession bound to the running event loop
+    """
+    loop = asyncio.get_running_loop()
+    session = _http_sessions.get(loop)
+    if session is None or session.closed:
+        session = aiohttp.ClientSession()
+        _http_sessions[loop] = session
+    return session
+
+async def close_http_session():
+    """
+    Close the aiohttp session of the running event loop, if there is one.
+    """
+    session = _http_sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None:
+        await session.close()
+
 async def get_deployed_records(server):
     """
     Download and return production records from the PROD_RECORDS_LOCATION.
@@ -312,13 +517,13 @@ async def get_deployed_records(server):
     else:
         raise Exception(f"Invalid server: {server}")
 
-
-    async with aiohttp.ClientSession() as session:
-        async with session.get(records_location) as response:
-            if response.status == 200:
-                data = await response.json()
-                records = data["data"]
-                remote_exceptions = [parse_rs_record(r) for r in records]
-                return remote_exceptions
-            else:
-                raise Exception(f"Failed to fetch production records. Status: {response.status}")
+    session = get_http_session()
+    async with session.get(records_location) as response:
+        if response.status == 200:
+            # Parse the raw body directly instead of going through
+            # response.json(), which decodes it to str with the stdlib
+            # json module first.
+            data = jsonUtils.loads(await response.read())
+            return [parse_rs_record(r) for r in data["data"]]
+        else:
+            raise Exception(f"Failed to fetch production records. Status: {response.status}")
@@ -0,0 +1,84 @@
+import asyncio
+import gc
+import pytest
+from url_classifier_exceptions_manager import remoteSettings
+
+class FakeAsyncClient():
+    def __init__(self, records):
+        self.records = records
+
+    async def get_records(self):
+        return self.records
+
+@pytest.fixture
+def sent_records(monkeypatch):
+    """Replace the server interactions of add_exceptions and collect the records it sends."""
+    sent = {"update": []}
+
+    async def fake_update_records(async_client, records):
+        sent["update"].append(list(records))
+
+    async def fake_request_review(async_client, is_dev):
+        pass
+
+    remote = FakeAsyncClient([{
+        "id": "prod-id",
+        "bugIds": ["123456"],
+        "urlPattern": "*://tracker.com/*",
+        "classifierFeatures": ["tracking-protection"],
+        "category": "baseline",
+    }])
+    monkeypatch.setattr(remoteSettings, "get_async_client", lambda server_location, auth_token: remote)
+    monkeypatch.setattr(remoteSettings, "update_records", fake_update_records)
+    monkeypatch.setattr(remoteSettings, "request_review", fake_request_review)
+    return sent
+
+@pytest.mark.asyncio
+async def test_add_exceptions_with_unknown_ids(sent_records):
+    """Test that exceptions whose ids are not on the server are matched by their fields instead."""
+    new_exceptions = [
+        {
+            "id": "stage-id-1",
+            "bugIds": ["123456"],
+            "urlPattern": "*://tracker.com/*",
+            "classifierFeatures": ["tracking-protection"],
+            "category": "baseline",
+        },
+        {
+            "id": "stage-id-2",
+            "bugIds": ["654321"],
+            "urlPattern": "*://other-tracker.com/*",
+            "classifierFeatures": ["tracking-protection"],
+            "category": "baseline",
+        },
+    ]
+
+    await remoteSettings.add_exceptions("https://example.com/v1", "Bearer token", new_exceptions, is_dev=True, force=True)
+
+    (to_update, to_create) = sent_records["update"]
+    assert [exception["id"] for exception in to_update] == ["prod-id"]
+    assert len(to_create) == 1
+    assert to_create[0]["urlPattern"] == "*://other-tracker.com/*"
+    assert to_create[0]["id"] not in ("stage-id-2", "prod-id")
+
+@pytest.mark.asyncio
+async def test_add_exceptions_discards_failed_fetch():
+    """Test that a remote fetch failing while it is cancelled is not reported as never retrieved."""
+    unhandled = []
+    asyncio.get_running_loop().set_exception_handler(lambda loop, context: unhandled.append(context))
+
+    async def failing_fetch():
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            raise ConnectionError("server unreachable")
+
+    remote_exceptions_task = asyncio.create_task(failing_fetch())
+    await asyncio.sleep(0)
+    await remoteSettings.add_exceptions("https://example.com/v1", "Bearer token", [], is_dev=True,
+                                        force=True, remote_exceptions_task=remote_exceptions_task)
+    await asyncio.sleep(0)
+    del remote_exceptions_task
+    gc.collect()
+
+    assert unhandled == []
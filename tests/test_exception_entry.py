@@ -0,0 +1,49 @@
+import pytest
+from url_classifier_exceptions_manager.exceptionEntry import (
+    ExceptionEntry,
+)
+
+def test_exception_entry_from_rs_record_flags():
+    """Test the global and blocking flags of an entry built from a RemoteSettings record."""
+    entry = ExceptionEntry()
+    entry.fromRSRecord({
+        "id": "2a50e5fa-4762-4a3b-a5d0-53a7e9bbe91a",
+        "bugIds": ["123456"],
+        "urlPattern": "*://example.com/*",
+        "classifierFeatures": ["tracking-annotation", "tracking-protection"],
+        "category": "baseline",
+    })
+
+    assert entry.isGlobalException() is True
+    assert entry.isBlockingEntry() is True
+
+def test_exception_entry_from_arguments_flags():
+    """Test the global and blocking flags of an entry built from arguments."""
+    entry = ExceptionEntry()
+    entry.fromArguments(
+        bugIds=["123456"],
+        urlPattern="*://example.com/*",
+        classifierFeatures=["tracking-annotation"],
+        topLevelUrlPattern="*://example.net/*",
+    )
+
+    assert entry.isGlobalException() is False
+    assert entry.isBlockingEntry() is False
+
+def test_exception_entry_from_template():
+    """Test that an entry built from a template applies the overrides and leaves the template untouched."""
+    template = {
+        "bugIds": ["123456"],
+        "urlPattern": "*://example.com/*",
+        "classifierFeatures": ["tracking-protection"],
+        "category": "baseline",
+        "topLevelUrlPattern": "*://example.net/*",
+    }
+    entry = ExceptionEntry()
+    entry.fromTemplate(template, category="convenience", isPrivateBrowsingOnly=True)
+
+    assert entry.toObject() == {**template, "category": "convenience", "isPrivateBrowsingOnly": True}
+    assert template["category"] == "baseline"
+    assert "isPrivateBrowsingOnly" not in template
+    assert entry.isGlobalException() is False
+    assert entry.isBlockingEntry() is True
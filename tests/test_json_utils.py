@@ -0,0 +1,16 @@
+import pytest
+from url_classifier_exceptions_manager import jsonUtils
+
+@pytest.mark.skipif(jsonUtils.orjson is None, reason="orjson is not installed")
+@pytest.mark.parametrize("sort_keys", [False, True])
+def test_dumps_backends_match(monkeypatch, sort_keys):
+    """Test that orjson and the json module serialize to the same string."""
+    obj = {
+        "urlPattern": "*://exämple.com/*",
+        "bugIds": ["123456"],
+        "filterContentBlockingCategories": [],
+        "extra": {"isPrivateBrowsingOnly": None, "topLevelUrlPattern": ""},
+    }
+    with_orjson = jsonUtils.dumps(obj, sort_keys=sort_keys)
+    monkeypatch.setattr(jsonUtils, "orjson", None)
+    assert jsonUtils.dumps(obj, sort_keys=sort_keys) == with_orjson
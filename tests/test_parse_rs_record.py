@@ -1,5 +1,6 @@
 import pytest
-from url_classifier_exceptions_manager.__main__ import (
+from url_classifier_exceptions_manager.remoteSettings import (
+    exception_match_key,
     parse_rs_record,
 )
 
@@ -61,3 +62,29 @@ def test_parse_rs_record_minimal():
     assert "isPrivateBrowsingOnly" not in parsed
     assert "filterContentBlockingCategories" not in parsed
     assert parsed["category"] == "convenience"
+
+def test_exception_match_key():
+    """Test that exceptions match regardless of id and list order."""
+    remote = {
+        "id": "2a50e5fa-4762-4a3b-a5d0-53a7e9bbe91a",
+        "bugIds": ["123456", "654321"],
+        "urlPattern": "*://example.com/*",
+        "classifierFeatures": ["tracking-protection", "emailtracking-protection"],
+        "filterContentBlockingCategories": ["standard"],
+    }
+    new = {
+        "bugIds": ["654321", "123456"],
+        "urlPattern": "*://example.com/*",
+        "classifierFeatures": ["emailtracking-protection", "tracking-protection"],
+        "filterContentBlockingCategories": ["standard"],
+    }
+    assert exception_match_key(remote) == exception_match_key(new)
+
+    del new["filterContentBlockingCategories"]
+    assert exception_match_key(remote) != exception_match_key(new)
+
+    del remote["filterContentBlockingCategories"]
+    assert exception_match_key(remote) == exception_match_key(new)
+
+    remote["filterContentBlockingCategories"] = []
+    assert exception_match_key(remote) == exception_match_key(new)
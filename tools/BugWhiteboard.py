@@ -1,9 +1,10 @@
 import re
 
+_FXWEBDIFF_RE = re.compile(r"\[fxwebdiff:([^\]]*)\]")
+
 class BugWhiteboard():
     def __init__(self, wb, user_story=None):
-        reg = r"\[fxwebdiff:([^]]*)\]"
-        match = re.search(reg, wb)
+        match = _FXWEBDIFF_RE.search(wb)
 
         if match:
             self.other_wb = wb[:match.span(0)[0]] + wb[match.span(0)[1]:]
@@ -27,10 +28,14 @@ class BugWhiteboard():
             for (idx,line) in enumerate(self.user_story):
                 if line.startswith("fxwebdiff:"):
                     self.user_story_idx = idx
-                    (_, self.user_story_metadata) = line.split(":", 1)
+                    (_, _, self.user_story_metadata) = line.partition(":")
                 elif line.startswith("trackers-"):
                     self.user_story_trackers_idx = idx
-                    (_, self.user_story_trackers_metadata) = line.split(":", 1)
+                    (_, _, self.user_story_trackers_metadata) = line.partition(":")
+
+                # Both lines found, the rest of the user story is kept as is.
+                if self.user_story_idx is not None and self.user_story_trackers_idx is not None:
+                    break
 
     def update_fields(self, status="", diagnosis="", error="", module="", user_story_metadata=None, user_story_trackers_metadata=None):
         if self.status != status:
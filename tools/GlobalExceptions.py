@@ -1,40 +1,51 @@
+import functools
+
+# Domains collapsed into a wildcard domain by postprocess_fix_domains, as
+# (domain, subdomain needle, wildcard domain).
+_WILDCARD_DOMAINS = (
+    ("userapi.com", ".userapi.com", "*.userapi.com"),
+    ("vk.com", ".vk.com", "*.vk.com"),
+)
+
 def postprocess_fix_domains(fix_domains):
     # TODO: This is a hardcoded hack
     ret = set()
 
     for fix_domain in fix_domains:
-        if ".userapi.com" in fix_domain or fix_domain == "userapi.com":
-            ret.add("*.userapi.com")
-        elif ".vk.com" in fix_domain or fix_domain == "vk.com":
-            ret.add("*.vk.com")
+        for (domain, needle, wildcard) in _WILDCARD_DOMAINS:
+            if needle in fix_domain or fix_domain == domain:
+                ret.add(wildcard)
+                break
         else:
             ret.add(fix_domain)
 
-    return list(ret)
+    return sorted(ret)
 
 class GlobalExceptions:
     def __init__(self, global_exceptions_file):
         with open(global_exceptions_file, "r") as fd:
-            self.global_exceptions = [x.replace("*.", "", 1).strip() if x.startswith("*.") else x.strip() for x in fd.readlines()]
+            global_exceptions = {x.replace("*.", "", 1).strip() if x.startswith("*.") else x.strip() for x in fd.readlines()}
 
-    def filter_global_exceptions(self, fix_domains):
-        fix_domains = fix_domains.split(",")
-        fix_domains = postprocess_fix_domains(fix_domains)
-        fix_domains.sort()
+        # Blank lines would match every domain.
+        global_exceptions.discard("")
+        self.global_exceptions = frozenset(global_exceptions)
 
-        matched_one = False
-        matched_all = True
+        # The same trackers are blocked on many sites, so the same fix domains
+        # get filtered over and over. The global exceptions don't change, so
+        # cache the results for the lifetime of this instance.
+        self._filter_fix_domains = functools.lru_cache(maxsize=None)(self._filter_fix_domains)
 
-        necessary_fix_domains = []
+    def _is_covered(self, fix_domain):
+        # A global exception covers every domain it is a substring of.
+        return any(exc in fix_domain for exc in self.global_exceptions)
 
-        for fix_domain in fix_domains:
-            found_exception_match = False
-            for exc in self.global_exceptions:
-                if exc in fix_domain:
-                    found_exception_match = True
-                    break
+    def filter_global_exceptions(self, fix_domains):
+        # Skip the empty hosts left by stray commas. postprocess_fix_domains
+        # dedupes and sorts the domains.
+        fix_domains = [fix_domain.strip() for fix_domain in fix_domains.split(",")]
+        fix_domains = postprocess_fix_domains(filter(None, fix_domains))
 
-            if not found_exception_match:
-                necessary_fix_domains.append(fix_domain)
+        return list(self._filter_fix_domains(tuple(fix_domains)))
 
-        return necessary_fix_domains
+    def _filter_fix_domains(self, fix_domains):
+        return tuple(fix_domain for fix_domain in fix_domains if not self._is_covered(fix_domain))
@@ -1,31 +1,34 @@
-import json
-
 from urllib.parse import urlparse
 
-class RemoteSettingsEntry():
-    def __init__(self, bug_id, tracker_domain, url=None, pbm_only=True, category="convenience", filterContentBlockingCategories = "", filter_expression=None):
-        self.obj = {}
-
-        self.obj["bugIds"] = [str(bug_id)]
-        self.obj["urlPattern"] = f"*://{tracker_domain}/*"
-        self.obj["classifierFeatures"] = [ "tracking-protection", "emailtracking-protection" ]
+import jsonUtils
 
-        if url is not None:
-            url = urlparse(url)
-            self.obj["topLevelUrlPattern"] = f"*://{url.netloc}/*"
+class RemoteSettingsEntry():
+    def __init__(self, bug_id, tracker_domain, url=None, pbm_only=True, category="convenience", filterContentBlockingCategories = "", filter_expression=None, top_level_netloc=None):
+        self.obj = {
+            "bugIds": [str(bug_id)],
+            "urlPattern": f"*://{tracker_domain}/*",
+            "classifierFeatures": [ "tracking-protection", "emailtracking-protection" ],
+            "filterContentBlockingCategories": filterContentBlockingCategories,
+            "category": category,
+        }
+
+        # Callers building several entries for the same url can parse it once
+        # and pass its netloc instead.
+        if top_level_netloc is None and url is not None:
+            top_level_netloc = urlparse(url).netloc
+
+        if top_level_netloc is not None:
+            self.obj["topLevelUrlPattern"] = f"*://{top_level_netloc}/*"
 
         if pbm_only:
             self.obj["isPrivateBrowsingOnly"] = pbm_only
 
-        self.obj["filterContentBlockingCategories"] = filterContentBlockingCategories
-        self.obj["category"] = category
-
         if filter_expression is not None:
             self.obj["filter_expression"] = filter_expression
 
 
     def toJSON(self):
-        return json.dumps(self.obj, indent=2)
+        return jsonUtils.dumps(self.obj)
 
     def toObject(self):
         return self.obj
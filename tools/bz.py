@@ -1,23 +1,104 @@
 from bugsy import Bugsy
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import sys
-import json
 import os
 import time
 
+import jsonUtils
+
+CACHE_FILE = "bz-cache.json"
+
+# Fields of the bugs stored in the cache.
+BUG_FIELDS = "id,last_change_time,summary,platform,url,whiteboard,status,resolution,severity,priority,cf_user_story,comments"
+
+# Bugs are fetched in pages of PAGE_SIZE, MAX_WORKERS pages at a time.
+PAGE_SIZE = 500
+MAX_WORKERS = 4
+
 bugsy = Bugsy()
+# Keep a connection per worker in the pool, and retry transient errors.
+bugsy.session.mount("https://", HTTPAdapter(
+  pool_maxsize=MAX_WORKERS,
+  max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504))))
 
-def get_bugs():
+def get_bugs_page(params, page):
+  page_params = dict(params, limit=PAGE_SIZE, offset=page * PAGE_SIZE)
+  return bugsy.request("bug", params=page_params)["bugs"]
+
+def get_bugs(changed_since=None, include_fields=BUG_FIELDS):
 
   params = {
     "product": "Web Compatibility",
     "component": "Privacy: Site Reports",
     "resolution": "---",
     "query_format": "advanced",
-    "include_fields": "id,last_change_time,summary,platform,url,whiteboard,status,resolution,severity,priority,cf_user_story,comments",
+    "include_fields": include_fields,
+    # A stable order, so the pages don't overlap.
+    "order": "bug_id",
   }
 
-  return bugsy.request("bug", params=params)
+  if changed_since is not None:
+    # Only fetch the bugs changed since then. Resolved ones are included, so
+    # they can be dropped from the cache.
+    del params["resolution"]
+    params["last_change_time"] = changed_since
+
+  bugs = []
+  first_page = 0
+  with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+    # Fetch the pages concurrently until one of them comes back short.
+    while True:
+      pages = list(executor.map(lambda page: get_bugs_page(params, page),
+                                range(first_page, first_page + MAX_WORKERS)))
+      for page in pages:
+        bugs.extend(page)
+
+      if len(pages[-1]) < PAGE_SIZE:
+        break
+      first_page += MAX_WORKERS
+
+  return bugs
+
+def load_cache():
+  try:
+    with open(CACHE_FILE, "rb") as fd:
+      return jsonUtils.loads(fd.read())["bugs"]
+  except FileNotFoundError:
+    return None
+
+def write_cache(bugs):
+  # Write to a temporary file first, so an interrupted run doesn't leave a
+  # truncated cache behind.
+  tmp_file = f"{CACHE_FILE}.tmp"
+  with open(tmp_file, 'w', encoding="utf-8") as fd:
+    fd.write(jsonUtils.dumps({"bugs": bugs}))
+  os.replace(tmp_file, CACHE_FILE)
+
+def main():
+  parser = argparse.ArgumentParser(description=f"Fetch the open privacy site report bugs into {CACHE_FILE}")
+  parser.add_argument("--full", action="store_true", help="Fetch all the bugs instead of updating the existing cache")
+  args = parser.parse_args()
+
+  cached_bugs = None if args.full else load_cache()
+  if not cached_bugs:
+    bugs = get_bugs()
+  else:
+    # Fetch the bugs changed since the last change in the cache, and merge
+    # them into it. The bugs that got resolved are dropped.
+    watermark = max(bug["last_change_time"] for bug in cached_bugs)
+    bugs_by_id = {bug["id"]: bug for bug in cached_bugs}
+    for bug in get_bugs(changed_since=watermark):
+      bugs_by_id[bug["id"]] = bug
+
+    # Bugs moved out of the component don't show up in the changes, keep only
+    # the bugs that are still open in it.
+    open_bug_ids = {bug["id"] for bug in get_bugs(include_fields="id")}
+    bugs = [bug for bug in bugs_by_id.values() if bug["id"] in open_bug_ids and not bug["resolution"]]
+
+  write_cache(bugs)
 
-cache = get_bugs()
-with open("bz-cache.json", 'w') as fd:
-    json.dump(fp=fd, obj=cache)
+if __name__ == "__main__":
+  main()
@@ -5,8 +5,12 @@ import os
 import sys
 import logging
 import json
+from concurrent.futures import ThreadPoolExecutor
 from http.client import HTTPConnection
 
+# Number of bugs closed concurrently.
+MAX_WORKERS = 8
+
 
 def setup_logging(debug=False):
     """Configure logging based on debug flag"""
@@ -32,7 +36,7 @@ def get_message(message_type):
 
 
 def close_bug(bugzilla, bug_id, resolution, message, dry_run=False, debug=False):
-    """Close a bug with the specified resolution and message"""
+    """Close a bug with the specified resolution and message, and return the output and error lines to report"""
     json_data = {
         "status": "RESOLVED",
         "resolution": resolution,
@@ -40,22 +44,22 @@ def close_bug(bugzilla, bug_id, resolution, message, dry_run=False, debug=False)
     }
     
     if dry_run:
-        print(f"[DRY RUN] Would close bug {bug_id} as {resolution}")
+        output = [f"[DRY RUN] Would close bug {bug_id} as {resolution}"]
         if debug:
-            print(f"[DEBUG] Raw JSON that would be sent:")
-            print(json.dumps(json_data, indent=2))
-        return
+            output.append(f"[DEBUG] Raw JSON that would be sent:")
+            output.append(json.dumps(json_data, indent=2))
+        return output, []
     
     try:
         bugzilla.request(
             f"bug/{bug_id}", 'PUT',
             json=json_data
         )
-        print(f"Bug {bug_id} has been closed as {resolution} with a comment.")
+        return [f"Bug {bug_id} has been closed as {resolution} with a comment."], []
     except Exception as e:
-        print(f"Error closing bug {bug_id}: {e}", file=sys.stderr)
         if debug:
             logging.exception("Full exception details:")
+        return [], [f"Error closing bug {bug_id}: {e}"]
 
 
 def main():
@@ -124,9 +128,21 @@ def main():
     # Get the message to use
     message = args.custom_message if args.custom_message else get_message(args.message)
     
-    # Process each bug
-    for bug_id in args.bug_ids:
-        close_bug(bugzilla, bug_id, args.resolution, message, args.dry_run, args.debug)
+    # Process the bugs concurrently, they share the connection pool of the
+    # Bugzilla session.
+    # The results are yielded in the order of the bug IDs. Write each bug's
+    # lines as soon as they are available, so an interrupted run still
+    # reports which bugs were already closed.
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        for (bug_output, bug_errors) in executor.map(
+                lambda bug_id: close_bug(bugzilla, bug_id, args.resolution, message, args.dry_run, args.debug),
+                args.bug_ids):
+            if bug_errors:
+                sys.stderr.write("\n".join(bug_errors) + "\n")
+                sys.stderr.flush()
+            if bug_output:
+                sys.stdout.write("\n".join(bug_output) + "\n")
+                sys.stdout.flush()
 
 
 if __name__ == "__main__":
@@ -1,13 +1,21 @@
 import os
 import sys
-import json
 import subprocess
 import re
 import argparse
 
+from operator import itemgetter
+from urllib.parse import urlparse
+
+import jsonUtils
 from GlobalExceptions import GlobalExceptions
 from RemoteSettingsEntry import RemoteSettingsEntry
 
+# Filter expressions of the entries for Firefox 142 and later, and for the
+# versions before it.
+FILTER_GE_142 = 'env.version|versionCompare("142.0a1") >= 0'
+FILTER_LT_142 = 'env.version|versionCompare("142.0a1") < 0'
+
 
 def main():
     parser = argparse.ArgumentParser(description='Process annotated bugs and generate remote settings')
@@ -15,17 +23,23 @@ def main():
     parser.add_argument('exceptions_file', help='File containing current global exceptions')
     args = parser.parse_args()
 
-    with open(args.bugs_file, "r") as fd:
-        data = json.load(fd)
+    with open(args.bugs_file, "rb") as fd:
+        data = jsonUtils.loads(fd.read())
 
     global_exceptions = GlobalExceptions(args.exceptions_file)
 
     ok_cnt=0
 
+    output = []
     affected_bugs = []
     remote_settings = []
 
-    for entry in sorted(data["bugs"], key=lambda x: x["id"], reverse=True):
+    # Only diagnosed bugs with a severity above S3 are of interest, filter them
+    # out before sorting.
+    bugs = [e for e in data["bugs"]
+            if "[privacy-team:diagnosed]" in e["whiteboard"] and e["severity"] not in ("S3", "S4")]
+
+    for entry in sorted(bugs, key=itemgetter("id"), reverse=True):
         bug_id = entry["id"]
         url = entry["url"]
         comments = entry["comments"]
@@ -33,17 +47,14 @@ def main():
         whiteboard = entry["whiteboard"]
         user_story = entry["cf_user_story"]
 
-        if "[privacy-team:diagnosed]" not in whiteboard:
-            continue
-
-        if entry["severity"] == "S4" or entry["severity"] == "S3":
-            continue
-
         url = entry["url"]
         if not url or not url.startswith("http"):
-            print(f"Warning: Ignoring Bug {bug_id}, bad URL? {url}")
+            output.append(f"Warning: Ignoring Bug {bug_id}, bad URL? {url}")
             continue
 
+        # All the entries of the bug share the same top level url.
+        netloc = urlparse(url).netloc
+
         category = "convenience"
         if "[exception-baseline]" in whiteboard:
             category = "baseline"
@@ -52,30 +63,33 @@ def main():
 
         for (idx,line) in enumerate(user_story.splitlines()):
             if line.startswith("trackers-blocked:"):
-                (_, hosts) = line.split(":", 2)
+                (_, _, hosts) = line.partition(":")
                 necessary_fix_domains = global_exceptions.filter_global_exceptions(hosts)
 
                 if not necessary_fix_domains:
-                    print(f"Warning: Ignoring Bug {bug_id}, covered by global exceptions?")
+                    output.append(f"Warning: Ignoring Bug {bug_id}, covered by global exceptions?")
                     continue
 
-                print(f"Bug {bug_id}: {necessary_fix_domains}")
+                output.append(f"Bug {bug_id}: {necessary_fix_domains}")
 
 
                 if not category:
-                    print(f"Warning: Ignoring Bug {bug_id}, no category found")
+                    output.append(f"Warning: Ignoring Bug {bug_id}, no category found")
                 else:
                     affected_bugs.append(bug_id)
                     for fix_domain in necessary_fix_domains:
                         remote_settings.append(RemoteSettingsEntry(
-                            bug_id, fix_domain, url, False, category,
-                            "", 'env.version|versionCompare("142.0a1") >= 0').toObject())
+                            bug_id, fix_domain, None, False, category,
+                            "", FILTER_GE_142, top_level_netloc=netloc).toObject())
                         remote_settings.append(RemoteSettingsEntry(
-                            bug_id, fix_domain, url, True, "convenience",
-                            "standard", 'env.version|versionCompare("142.0a1") < 0').toObject())
+                            bug_id, fix_domain, None, True, "convenience",
+                            "standard", FILTER_LT_142, top_level_netloc=netloc).toObject())
+
+    output.append(str(affected_bugs))
+    output.append(jsonUtils.dumps(remote_settings))
 
-    print(affected_bugs)
-    print(json.dumps(remote_settings, indent=2))
+    # Write all the output at once, instead of a print per line.
+    sys.stdout.write("\n".join(output) + "\n")
 
 if __name__ == "__main__":
     main()